@@ -434,7 +434,8 @@ def _fetch_bundle_contents_info(uuid, path=''):
 
     Query parameters:
     - `depth`: recursively fetch subdirectory info up to this depth.
-      Default is 0.
+      Default is 0. Depths greater than 10 are capped at 10, so directories
+      10 levels deep are returned without `contents`.
 
     Response format:
     ```
@@ -466,7 +467,7 @@ def _fetch_bundle_contents_info(uuid, path=''):
         info = local.download_manager.get_target_info(target, depth)
         # Object is not JSON serializable so submit its dict in API response
         # The client is responsible for deserializing it
-        info['resolved_target'] = info['resolved_target'].__dict__
+        info['resolved_target'] = info['resolved_target'].to_dict()
     except NotFoundError as e:
         abort(http.client.NOT_FOUND, str(e))
     except Exception as e:
@@ -1,18 +1,25 @@
+from collections import OrderedDict
 import math
 import os
 import stat
 import tarfile
+import threading
+import time
 import logging
 import traceback
-from typing import Any, Iterable, Generator, Optional, Union, cast, Dict
+from typing import Any, Iterable, Generator, Optional, Tuple, Union, cast, Dict
 from typing_extensions import TypedDict
 
 from apache_beam.io.filesystems import FileSystems
-from codalab.common import parse_linked_bundle_url
+from codalab.common import StorageURLScheme, parse_linked_bundle_url
 from codalab.worker.file_util import OpenIndexedArchiveFile
 from codalab.lib.beam.ratarmount import FileInfo
 
 
+_AZFS_PREFIX = StorageURLScheme.AZURE_BLOB_STORAGE.value
+_SEP = os.path.sep
+
+
 class PathException(Exception):
     pass
 
@@ -31,6 +38,8 @@ class BundleTarget:
         (dep-bundle, dep-subpath/subpath)
     """
 
+    __slots__ = ('bundle_uuid', 'subpath')
+
     def __init__(self, bundle_uuid, subpath):
         self.bundle_uuid = bundle_uuid
         self.subpath = subpath
@@ -45,10 +54,17 @@ class BundleTarget:
     def from_dict(cls, dct):
         return cls(dct['bundle_uuid'], dct['subpath'])
 
+    def to_dict(self):
+        return {'bundle_uuid': self.bundle_uuid, 'subpath': self.subpath}
+
     def __str__(self):
         return "{}:{}".format(self.bundle_uuid, self.subpath)
 
 
+# Maximum depth of directory contents returned by get_target_info. Deeper requests are
+# clamped to this, so that a single request can't walk an arbitrarily deep tree.
+MAX_TARGET_INFO_DEPTH = 10
+
 TargetInfo = TypedDict(
     'TargetInfo',
     {
@@ -64,6 +80,53 @@ TargetInfo = TypedDict(
 )
 
 
+class _TargetInfoCache(object):
+    """A thread-safe cache of target infos, whose entries expire after ttl seconds.
+
+    Browsing a bundle repeatedly asks for the same target infos (e.g., the parent
+    directory when clicking through its children). Local entries are keyed by the
+    target's mtime as well, and the short ttl bounds how stale the contents of a
+    directory (e.g., the sizes of files in a running bundle) can be.
+
+    Entries are kept in the order they expire in, so expired entries are dropped from
+    the front whenever a new one is added; at most maxsize entries are kept.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Tuple, Tuple[float, TargetInfo]]' = OrderedDict()
+
+    def get(self, key: Tuple) -> Optional[TargetInfo]:
+        """Returns a copy of the cached target info for key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expiry, info = entry
+            if expiry < time.monotonic():
+                del self._entries[key]
+                return None
+        # Callers only set top-level keys (e.g., resolved_target) on the returned
+        # target info, so a shallow copy keeps the cached one intact.
+        return cast(TargetInfo, dict(info))
+
+    def put(self, key: Tuple, info: TargetInfo):
+        now = time.monotonic()
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (now + self.ttl, cast(TargetInfo, dict(info)))
+            while self._entries:
+                oldest_key, (expiry, _) = next(iter(self._entries.items()))
+                if expiry >= now and len(self._entries) <= self.maxsize:
+                    break
+                del self._entries[oldest_key]
+
+
+_target_info_cache = _TargetInfoCache(maxsize=4096, ttl=2.0)
+
+
 def get_target_info(bundle_path: str, target: BundleTarget, depth: int) -> TargetInfo:
     """
     Generates an index of the contents of the given path. The index contains
@@ -80,17 +143,27 @@ def get_target_info(bundle_path: str, target: BundleTarget, depth: int) -> Targe
     Any entries more than depth levels deep are filtered out. Depth 0, for
     example, means only the top-level entry is included, and no contents. Depth
     1 means the contents of the top-level are included, but nothing deeper.
+    Depth is capped at MAX_TARGET_INFO_DEPTH.
 
     If the given path does not exist, raises PathException.
 
     If reading the given path is not secure, raises a PathException.
     """
+    depth = min(depth, MAX_TARGET_INFO_DEPTH)
     final_path = _get_normalized_target_path(bundle_path, target)
-    if parse_linked_bundle_url(final_path).uses_beam:
+    if _is_azfs(final_path):
         # If the target is on Blob Storage, use a Blob-specific method
         # to get the target info.
         try:
-            info = _compute_target_info_blob(final_path, depth)
+            # Contents of bundles that aren't final yet can be uploaded again to the
+            # same path, so key the cache by the checksum (the ETag, on Azure Blob
+            # Storage) of the archive as well. This only reads the blob's properties.
+            checksum = FileSystems.checksum(parse_linked_bundle_url(final_path).bundle_path)
+            cache_key: Tuple = (final_path, depth, checksum)
+            info = _target_info_cache.get(cache_key)
+            if info is None:
+                info = _compute_target_info_blob(final_path, depth)
+                _target_info_cache.put(cache_key, info)
         except Exception:
             logging.error(
                 "Path '{}' in bundle {} not found: {}".format(
@@ -101,11 +174,17 @@ def get_target_info(bundle_path: str, target: BundleTarget, depth: int) -> Targe
                 "Path '{}' in bundle {} not found".format(target.subpath, target.bundle_uuid)
             )
     else:
-        if not os.path.islink(final_path) and not os.path.exists(final_path):
+        try:
+            stat_result = os.lstat(final_path)
+        except OSError:
             raise PathException(
                 "Path '{}' in bundle {} not found".format(target.subpath, target.bundle_uuid)
             )
-        info = _compute_target_info_local(final_path, depth)
+        cache_key = (final_path, depth, stat_result.st_mtime_ns)
+        info = _target_info_cache.get(cache_key)
+        if info is None:
+            info = _compute_target_info_local(final_path, depth, stat_result)
+            _target_info_cache.put(cache_key, info)
 
     info['resolved_target'] = target
     return info
@@ -130,57 +209,104 @@ def get_target_path(bundle_path: str, target: BundleTarget) -> str:
 BUNDLE_NO_LONGER_RUNNING_MESSAGE = 'Bundle no longer running'
 
 
+def _is_azfs(path: str) -> bool:
+    """Returns whether the given path is on Azure Blob Storage. This is equivalent to
+    parse_linked_bundle_url(path).uses_beam, without parsing the rest of the URL."""
+    return path[: len(_AZFS_PREFIX)] == _AZFS_PREFIX
+
+
 def _get_normalized_target_path(bundle_path: str, target: BundleTarget) -> str:
-    if parse_linked_bundle_url(bundle_path).uses_beam:
+    if _is_azfs(bundle_path):
         # On Azure, don't call os.path functions on the paths (which are azfs:// URLs).
         # We can just concatenate them together.
         return f"{bundle_path}/{target.subpath}" if target.subpath else bundle_path
     else:
         real_bundle_path = os.path.realpath(bundle_path)
-        normalized_target_path = os.path.normpath(
-            _get_target_path(real_bundle_path, target.subpath)
-        )
+        target_path = _get_target_path(real_bundle_path, target.subpath)
 
     error_path = _get_target_path(target.bundle_uuid, target.subpath)
 
-    if not normalized_target_path.startswith(real_bundle_path):
+    normalized_target_path = os.path.normpath(target_path)
+
+    # Compare against the bundle path with a trailing separator, so that a sibling
+    # such as "/bundles/0x12" doesn't count as being inside "/bundles/0x1".
+    bundle_prefix = os.path.join(real_bundle_path, '')
+    if normalized_target_path != real_bundle_path and not normalized_target_path.startswith(
+        bundle_prefix
+    ):
         raise PathException('%s is not inside the bundle.' % error_path)
 
+    # Reading "link/file" goes through the symlink, and normalizing can't tell. Check
+    # the components of the normalized path, since that is the path that is read; it no
+    # longer contains "..", so a missing component means nothing below it exists either.
+    # The last component is not checked here, since callers may ask for info about a
+    # symlink itself.
+    _check_no_intermediate_symlinks(
+        real_bundle_path, normalized_target_path[len(bundle_prefix) :], error_path
+    )
+
     return normalized_target_path
 
 
+def _check_no_intermediate_symlinks(real_bundle_path: str, subpath: str, error_path: str):
+    """Raises a PathException if any directory component of subpath (all but the
+    last one) is a symlink. subpath must be normalized and relative to real_bundle_path.
+    Stops at the first component that doesn't exist."""
+    if not subpath:
+        return
+    partial_path = real_bundle_path
+    for component in subpath.split(_SEP)[:-1]:
+        partial_path = partial_path + _SEP + component
+        try:
+            mode = os.lstat(partial_path).st_mode
+        except OSError:
+            return
+        if stat.S_ISLNK(mode):
+            raise PathException(
+                '%s contains a symlink and following symlinks is not allowed.' % error_path
+            )
+
+
 def _get_target_path(bundle_path, path):
     if path:
         # Don't use os.path.join, since we don't want an absolute path to
         # override the bundle path.
-        return bundle_path + os.path.sep + path
+        return f"{bundle_path}{_SEP}{path}"
     else:
         return bundle_path
 
 
-def _compute_target_info_local(path: str, depth: Union[int, float]) -> TargetInfo:
-    """Computes target info for a local file."""
-    stat = os.lstat(path)
+def _compute_target_info_local(
+    path: str, depth: Union[int, float], stat_result: Optional[os.stat_result] = None
+) -> TargetInfo:
+    """Computes target info for a local file. stat_result, if given, must be the
+    result of os.lstat(path), e.g. as obtained while scanning the parent directory."""
+    if stat_result is None:
+        stat_result = os.lstat(path)
+    # Determine the type from the lstat result we already have, rather than
+    # stat'ing the path again for each check.
+    mode = stat_result.st_mode
     result: TargetInfo = {
         'name': os.path.basename(path),
-        'size': stat.st_size,
-        'perm': stat.st_mode & 0o777,
+        'size': stat_result.st_size,
+        'perm': mode & 0o777,
         'type': '',
     }
-    if os.path.islink(path):
+    if stat.S_ISLNK(mode):
         result['type'] = 'link'
         result['link'] = os.readlink(path)
-    elif os.path.isfile(path):
+    elif stat.S_ISREG(mode):
         result['type'] = 'file'
-    elif os.path.isdir(path):
+    elif stat.S_ISDIR(mode):
         result['type'] = 'directory'
         if depth > 0:
-            result['contents'] = [
-                _compute_target_info_local(os.path.join(path, file_name), depth - 1)
-                for file_name in os.listdir(path)
-            ]
-    if result is None:
-        raise PathException()
+            with os.scandir(path) as entries:
+                result['contents'] = [
+                    _compute_target_info_local(
+                        entry.path, depth - 1, entry.stat(follow_symlinks=False)
+                    )
+                    for entry in entries
+                ]
     return result
 
 
@@ -224,15 +350,22 @@ def _compute_target_info_blob(
         isdir = lambda finfo: finfo.type == tarfile.DIRTYPE
         listdir = lambda path: cast(Dict[str, FileInfo], tf.getFileInfo(path, listDir=True) or {})
 
-        def _get_info(path: str, depth: Union[int, float]) -> TargetInfo:
+        def _get_info(
+            path: str, depth: Union[int, float], finfo: Optional[FileInfo] = None
+        ) -> TargetInfo:
             """This function is called to get the target info of the specified path.
             If the specified path is a directory and additional depth is requested, this
             function is recursively called to retrieve the target info of files within
             the directory, much like _compute_target_info_local.
+
+            finfo, if given, must be the FileInfo of path. Listing a directory already
+            returns the FileInfo of each of its entries, so it is passed down rather than
+            looked up again in the index for every entry.
             """
             if not path.startswith("/"):
                 path = "/" + path
-            finfo = cast(FileInfo, tf.getFileInfo(path))
+            if finfo is None:
+                finfo = cast(FileInfo, tf.getFileInfo(path))
             if finfo is None:
                 # Not found
                 raise PathException("File not found.")
@@ -251,8 +384,8 @@ def _compute_target_info_blob(
                 result['type'] = 'directory'
                 if depth > 0:
                     result['contents'] = process_contents(
-                        _get_info(path + "/" + file_name, depth - 1)
-                        for file_name in listdir(path)
+                        _get_info(path + "/" + file_name, depth - 1, file_info)
+                        for file_name, file_info in listdir(path).items()
                         if file_name != "."
                     )
             return result
@@ -290,8 +423,8 @@ def _compute_target_info_blob(
             }
             if depth > 0:
                 result['contents'] = process_contents(
-                    _get_info(file_name, depth - 1)
-                    for file_name in listdir("/")
+                    _get_info(file_name, depth - 1, file_info)
+                    for file_name, file_info in listdir("/").items()
                     if file_name != "."
                 )
             return result
@@ -312,11 +445,15 @@ def compute_target_info_blob_descendants_flat(path: str) -> Generator[TargetInfo
     )  # We want to return a generator so that we can expand *all* descendants without adding additional overhead.
 
     def get_results(tinfo: TargetInfo, prefix="") -> Generator[TargetInfo, None, None]:
-        yield cast(TargetInfo, dict(tinfo, contents=None, name=prefix + tinfo["name"]))
-        for t in tinfo.get('contents') or []:
-            yield from get_results(t, prefix + tinfo['name'] + '/')
+        name = prefix + tinfo["name"]
+        yield cast(TargetInfo, dict(tinfo, contents=None, name=name))
+        contents = tinfo.get('contents')
+        if contents:
+            # Compute the prefix of the children once, rather than once per child.
+            child_prefix = name + '/'
+            for t in contents:
+                yield from get_results(t, child_prefix)
 
     yield cast(TargetInfo, dict(target_info, contents=None, name=""))
     for t in target_info.get('contents') or []:
-        print("CONTENTT", t)
         yield from get_results(t)
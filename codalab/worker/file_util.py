@@ -1,3 +1,5 @@
+import atexit
+from collections import Counter, OrderedDict
 from contextlib import closing
 from io import BytesIO, TextIOWrapper
 import gzip
@@ -5,6 +7,7 @@ import os
 import shutil
 import subprocess
 import bz2
+import threading
 
 from codalab.common import BINARY_PLACEHOLDER, UsageError
 from codalab.common import parse_linked_bundle_url
@@ -17,7 +20,7 @@ import tempfile
 import tarfile
 from codalab.lib.beam.ratarmount import SQLiteIndexedTar, FileInfo
 from codalab.lib.beam.streamingzipfile import StreamingZipFile
-from typing import IO, cast
+from typing import IO, Optional, Set, Tuple, cast
 
 NONE_PLACEHOLDER = '<none>'
 
@@ -171,13 +174,130 @@ def unzip_directory(fileobj: IO[bytes], directory_path: str, force: bool = False
             zf.extract(member, directory_path)
 
 
+class ArchiveIndexCache(object):
+    """Keeps recently used index.sqlite files of archives on Azure Blob Storage on
+    local disk, so that repeated reads of the same archive (e.g., when browsing a
+    bundle) don't download its index again each time.
+
+    Contents of bundles that aren't final yet can be uploaded again to the same path,
+    so each cached index file is stored along with the checksum (the ETag, on Azure
+    Blob Storage) of the index it was downloaded from. If the index has changed since
+    then, it is downloaded again, since the old one no longer matches the offsets
+    in the new archive. The cache holds at most max_bytes of index files
+    (but always keeps the most recently used one), in a temporary directory that is
+    removed when the process exits. An evicted index file is only removed from disk
+    once nobody is using it anymore.
+    """
+
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._directory: Optional[str] = None
+        # Maps index path -> (checksum of the index, local file name, size of the local file).
+        self._entries: 'OrderedDict[str, Tuple[str, str, int]]' = OrderedDict()
+        self._total_bytes = 0
+        self._refcounts: Counter = Counter()
+        self._evicted: Set[str] = set()
+
+    def acquire(self, index_path: str) -> str:
+        """Returns the name of a local copy of the given index file. The caller must
+        call release() with the returned name once it is done with the file.
+        """
+        # This only looks up the metadata of the index, without reading it.
+        checksum = FileSystems.checksum(index_path)
+        with self._lock:
+            index_file_name = self._get_entry(index_path, checksum)
+            if index_file_name is not None:
+                self._refcounts[index_file_name] += 1
+                return index_file_name
+            if self._directory is None:
+                self._directory = tempfile.mkdtemp(prefix="codalab-archive-indexes-")
+                atexit.register(shutil.rmtree, self._directory, ignore_errors=True)
+            directory = self._directory
+
+        # Download outside of the lock, so that other indexes can be read in the meantime.
+        with tempfile.NamedTemporaryFile(
+            suffix=".sqlite", dir=directory, delete=False
+        ) as index_fileobj:
+            index_file_name = index_fileobj.name
+            try:
+                shutil.copyfileobj(
+                    FileSystems.open(index_path, compression_type=CompressionTypes.UNCOMPRESSED),
+                    index_fileobj,
+                )
+            except Exception:
+                # The partial file isn't in the cache yet, so nothing else would remove it.
+                os.remove(index_file_name)
+                raise
+        size = os.path.getsize(index_file_name)
+
+        with self._lock:
+            existing_file_name = self._get_entry(index_path, checksum)
+            if existing_file_name is not None:
+                # Another thread downloaded the same index in the meantime.
+                os.remove(index_file_name)
+                index_file_name = existing_file_name
+            else:
+                self._entries[index_path] = (checksum, index_file_name, size)
+                self._total_bytes += size
+                while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                    self._evict(next(iter(self._entries)))
+            self._refcounts[index_file_name] += 1
+            return index_file_name
+
+    def release(self, index_file_name: str):
+        with self._lock:
+            self._refcounts[index_file_name] -= 1
+            self._remove_if_unused(index_file_name)
+
+    def _get_entry(self, index_path: str, checksum: str) -> Optional[str]:
+        """Returns the local file name cached for index_path, if any, and if it was
+        downloaded from an index with the given checksum. Must be called with the lock
+        held."""
+        entry = self._entries.get(index_path)
+        if entry is None:
+            return None
+        cached_checksum, index_file_name, _ = entry
+        if cached_checksum != checksum:
+            # The index was uploaded again since it was cached.
+            self._evict(index_path)
+            return None
+        if not os.path.exists(index_file_name):
+            # SQLiteIndexedTar removes index files that it fails to load, so don't
+            # keep handing out a file that is gone.
+            self._evict(index_path)
+            return None
+        self._entries.move_to_end(index_path)
+        return index_file_name
+
+    def _evict(self, index_path: str):
+        """Must be called with the lock held."""
+        _, index_file_name, size = self._entries.pop(index_path)
+        self._total_bytes -= size
+        self._evicted.add(index_file_name)
+        self._remove_if_unused(index_file_name)
+
+    def _remove_if_unused(self, index_file_name: str):
+        if index_file_name in self._evicted and self._refcounts[index_file_name] <= 0:
+            self._evicted.remove(index_file_name)
+            del self._refcounts[index_file_name]
+            try:
+                os.remove(index_file_name)
+            except FileNotFoundError:
+                pass
+
+
+archive_index_cache = ArchiveIndexCache()
+
+
 class OpenIndexedArchiveFile(object):
     """Open an archive file (.tar.gz / .gz) specified by the provided path on Azure Blob Storage.
     Also reads this file's associated index.sqlite file, then opens the file as an
     SQLiteIndexedTar object.
 
     This way, the archive file can be read and specific files can be extracted without
-    needing to download the entire archive file.
+    needing to download the entire archive file. The index file is shared through
+    archive_index_cache, so it is only downloaded once for repeated reads.
 
     Returns the SQLiteIndexedTar object.
     """
@@ -185,18 +305,12 @@ class OpenIndexedArchiveFile(object):
     def __init__(self, path: str):
         self.f = FileSystems.open(path, compression_type=CompressionTypes.UNCOMPRESSED)
         self.path = path
-        with tempfile.NamedTemporaryFile(suffix=".sqlite", delete=False) as index_fileobj:
-            self.index_file_name = index_fileobj.name
-            shutil.copyfileobj(
-                FileSystems.open(
-                    # path can end in either "contents.tar.gz" (if a directory) or "contents.gz" (if a file).
-                    path.replace("/contents.tar.gz", "/index.sqlite").replace(
-                        "/contents.gz", "/index.sqlite"
-                    ),
-                    compression_type=CompressionTypes.UNCOMPRESSED,
-                ),
-                index_fileobj,
+        self.index_file_name = archive_index_cache.acquire(
+            # path can end in either "contents.tar.gz" (if a directory) or "contents.gz" (if a file).
+            path.replace("/contents.tar.gz", "/index.sqlite").replace(
+                "/contents.gz", "/index.sqlite"
             )
+        )
 
     def __enter__(self) -> SQLiteIndexedTar:
         return SQLiteIndexedTar(
@@ -208,7 +322,7 @@ class OpenIndexedArchiveFile(object):
         )
 
     def __exit__(self, type, value, traceback):
-        os.remove(self.index_file_name)
+        archive_index_cache.release(self.index_file_name)
 
 
 class OpenFile(object):
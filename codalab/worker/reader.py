@@ -86,7 +86,7 @@ class Reader(object):
             ]
         # Object is not JSON serializable so submit its dict in API response
         # The client is responsible for deserializing it
-        target_info['resolved_target'] = target_info['resolved_target'].__dict__
+        target_info['resolved_target'] = target_info['resolved_target'].to_dict()
         reply_fn(None, {'target_info': target_info}, None)
 
     def stream_directory(self, run_state, path, args, reply_fn):
@@ -26,7 +26,14 @@ class UnseekableBytesIO(BytesIO):
 
 
 class StreamingZipFileTest(unittest.TestCase):
-    def create_zip_single_file(self):
+    @classmethod
+    def setUpClass(cls):
+        # The archives are immutable bytes, so build them once and share them across tests.
+        cls.zip_single_file = cls.create_zip_single_file()
+        cls.zip_complex = cls.create_zip_complex()
+
+    @staticmethod
+    def create_zip_single_file():
         """Create a simple .zip file with a single file in it."""
         with tempfile.TemporaryDirectory() as tmpdir, open(
             os.path.join(tmpdir, "file.txt"), "wb"
@@ -36,7 +43,8 @@ class StreamingZipFileTest(unittest.TestCase):
             zip_contents = zip_directory(tmpdir).read()
             return zip_contents
 
-    def create_zip_complex(self):
+    @staticmethod
+    def create_zip_complex():
         """Create a complex .zip file with files / directories / nested directories in it."""
         with tempfile.TemporaryDirectory() as tmpdir:
             os.makedirs(os.path.join(tmpdir, "a/b"))
@@ -53,7 +61,7 @@ class StreamingZipFileTest(unittest.TestCase):
 
     def test_seekable_file_read_by_zipfile(self):
         """Seekable file can be read by ZipFile"""
-        zip_contents = self.create_zip_single_file()
+        zip_contents = self.zip_single_file
         with ZipFile(BytesIO(zip_contents)) as zf:
             infolist = zf.infolist()
             self.assertEqual(infolist[0].filename, "file.txt")
@@ -62,13 +70,13 @@ class StreamingZipFileTest(unittest.TestCase):
 
     def test_unseekable_file_cannot_read_by_zipfile(self):
         """Unseekable file cannot be read by ZipFile"""
-        zip_contents = self.create_zip_single_file()
+        zip_contents = self.zip_single_file
         with self.assertRaises(BadZipFile):
             ZipFile(UnseekableBytesIO(zip_contents))
 
     def test_unseekable_file_read_by_streamingzipfile(self):
         """Unseekable file can be read by StreamingZipFile"""
-        zip_contents = self.create_zip_single_file()
+        zip_contents = self.zip_single_file
         with StreamingZipFile(UnseekableBytesIO(zip_contents)) as zf:
             for zinfo in zf:
                 self.assertEqual(zinfo.filename, "file.txt")
@@ -93,7 +101,7 @@ class StreamingZipFileTest(unittest.TestCase):
 
     def test_unseekable_file_read_partially(self):
         """Unseekable file can be read partially. Read a file within the archive byte by byte."""
-        zip_contents = self.create_zip_single_file()
+        zip_contents = self.zip_single_file
         buf = BytesBuffer()
         buf.write(zip_contents)
         with StreamingZipFile(buf) as zf:
@@ -116,7 +124,7 @@ class StreamingZipFileTest(unittest.TestCase):
 
     def test_read_complex(self):
         """Zip file with a complex directory structure can be read by ZipFile / StreamingZipFile properly"""
-        zip_contents = self.create_zip_complex()
+        zip_contents = self.zip_complex
         expected_zinfos = [
             ('a/', 0, True, b''),
             ('a/b/', 0, True, b''),
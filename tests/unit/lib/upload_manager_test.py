@@ -92,8 +92,11 @@ class UploadManagerTest(unittest.TestCase):
         The URL will end in the extension "ext", if given.
         """
         url = f"https://codalab/contents{ext}"
-        size = len(fileobj.read())
-        fileobj.seek(0)
+        if isinstance(fileobj, BytesIO):
+            size = fileobj.getbuffer().nbytes
+        else:
+            size = fileobj.seek(0, os.SEEK_END)
+            fileobj.seek(0)
         urllib.request.urlopen = MagicMock()
         urllib.request.urlopen.return_value = addinfourl(fileobj, {"content-length": size}, url)
         return url
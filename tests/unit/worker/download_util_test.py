@@ -1,10 +1,13 @@
 import tests.unit.azure_blob_mock  # noqa: F401
 from codalab.worker.download_util import (
     get_target_info,
+    get_target_path,
     BundleTarget,
     compute_target_info_blob_descendants_flat,
     PathException,
+    MAX_TARGET_INFO_DEPTH,
 )
+import os
 import unittest
 import random
 import tarfile
@@ -29,9 +32,10 @@ class AzureBlobTestBase:
             f.write(contents)
         return bundle_uuid, bundle_path
 
-    def create_file(self, contents=b"hello world"):
-        """Creates a file on Blob (stored as a .gz with an index.sqlite index file) and returns its path."""
-        bundle_uuid = str(random.random())
+    def create_file(self, contents=b"hello world", bundle_uuid=None):
+        """Creates a file on Blob (stored as a .gz with an index.sqlite index file) and returns its path.
+        If bundle_uuid is given, the contents of that bundle are replaced."""
+        bundle_uuid = bundle_uuid or str(random.random())
         bundle_path = f"azfs://storageclwsdev0/bundles/{bundle_uuid}/contents.gz"
         compressed_file = BytesIO(gzip.compress(contents))
         # TODO: Unify this code with code in UploadManager.upload_to_bundle_store().
@@ -121,6 +125,17 @@ class AzureBlobGetTargetInfoTest(AzureBlobTestBase, unittest.TestCase):
             target_info, {'name': bundle_uuid, 'type': 'file', 'size': 1, 'perm': 0o755}
         )
 
+    def test_reuploaded_file(self):
+        """Test that target info is not served from the cache after the contents are uploaded again."""
+        bundle_uuid, bundle_path = self.create_file(b"a")
+        self.assertEqual(
+            get_target_info(bundle_path, BundleTarget(bundle_uuid, None), 0)["size"], 1
+        )
+        self.create_file(b"hello", bundle_uuid=bundle_uuid)
+        self.assertEqual(
+            get_target_info(bundle_path, BundleTarget(bundle_uuid, None), 0)["size"], 5
+        )
+
     def test_nested_directories(self):
         """Test getting target info of different files within a bundle that consists of nested directories, on Azure Blob Storage."""
         bundle_uuid, bundle_path = self.create_directory()
@@ -253,3 +268,79 @@ class AzureBlobGetTargetInfoTest(AzureBlobTestBase, unittest.TestCase):
                 },
             ],
         )
+
+
+class LocalGetTargetInfoTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.bundle_path = os.path.join(self.temp_dir, "bundle")
+        os.makedirs(os.path.join(self.bundle_path, "dir"))
+        with open(os.path.join(self.bundle_path, "dir", "file.txt"), "w") as f:
+            f.write("hello world")
+        with open(os.path.join(self.temp_dir, "secret.txt"), "w") as f:
+            f.write("secret")
+        os.symlink(self.temp_dir, os.path.join(self.bundle_path, "link"))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_symlink_target(self):
+        """A symlink itself can be listed, but not read through get_target_path."""
+        target_info = get_target_info(self.bundle_path, BundleTarget("uuid", "link"), 0)
+        self.assertEqual(target_info["type"], "link")
+        with self.assertRaises(PathException):
+            get_target_path(self.bundle_path, BundleTarget("uuid", "link"))
+
+    def test_intermediate_symlink(self):
+        """Paths that go through a symlink are rejected."""
+        with self.assertRaises(PathException):
+            get_target_info(self.bundle_path, BundleTarget("uuid", "link/secret.txt"), 0)
+        with self.assertRaises(PathException):
+            get_target_path(self.bundle_path, BundleTarget("uuid", "link/secret.txt"))
+        for subpath in ("dir/../link/secret.txt", "missing/../link/secret.txt"):
+            with self.assertRaises(PathException):
+                get_target_info(self.bundle_path, BundleTarget("uuid", subpath), 0)
+            with self.assertRaises(PathException):
+                get_target_path(self.bundle_path, BundleTarget("uuid", subpath))
+        self.assertEqual(
+            get_target_path(self.bundle_path, BundleTarget("uuid", "dir/file.txt")),
+            os.path.join(os.path.realpath(self.bundle_path), "dir", "file.txt"),
+        )
+
+    def test_sibling_bundle(self):
+        """Paths in a sibling directory that shares the bundle's name as a prefix are rejected."""
+        os.makedirs(self.bundle_path + "2")
+        with open(os.path.join(self.bundle_path + "2", "file.txt"), "w") as f:
+            f.write("hello world")
+        with self.assertRaises(PathException):
+            get_target_info(self.bundle_path, BundleTarget("uuid", "../bundle2/file.txt"), 0)
+        with self.assertRaises(PathException):
+            get_target_path(self.bundle_path, BundleTarget("uuid", "../bundle2/file.txt"))
+
+    def test_cached_target_info(self):
+        """Cached target infos are not affected by callers and are refreshed when the target changes."""
+        target = BundleTarget("uuid", "dir/file.txt")
+        target_info = get_target_info(self.bundle_path, target, 0)
+        self.assertEqual(target_info["size"], 11)
+        target_info["size"] = 0
+        self.assertEqual(get_target_info(self.bundle_path, target, 0)["size"], 11)
+
+        file_path = os.path.join(self.bundle_path, "dir", "file.txt")
+        mtime_ns = os.stat(file_path).st_mtime_ns
+        with open(file_path, "w") as f:
+            f.write("hello")
+        os.utime(file_path, ns=(mtime_ns + 10 ** 9, mtime_ns + 10 ** 9))
+        self.assertEqual(get_target_info(self.bundle_path, target, 0)["size"], 5)
+
+    def test_max_depth(self):
+        """Listings deeper than MAX_TARGET_INFO_DEPTH are cut off at that depth."""
+        os.makedirs(os.path.join(self.bundle_path, "deep", *["d"] * (MAX_TARGET_INFO_DEPTH + 5)))
+        target_info = get_target_info(
+            self.bundle_path, BundleTarget("uuid", "deep"), MAX_TARGET_INFO_DEPTH + 5
+        )
+        levels = 0
+        while "contents" in target_info:
+            (target_info,) = target_info["contents"]
+            levels += 1
+        self.assertEqual(levels, MAX_TARGET_INFO_DEPTH)
+        self.assertEqual(target_info["type"], "directory")
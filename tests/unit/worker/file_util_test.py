@@ -5,6 +5,8 @@ import tempfile
 import unittest
 import bz2
 import gzip
+from unittest.mock import patch
+from apache_beam.io.filesystems import FileSystems
 
 from codalab.worker.file_util import (
     gzip_file,
@@ -18,6 +20,7 @@ from codalab.worker.file_util import (
     zip_directory,
     unzip_directory,
     OpenFile,
+    ArchiveIndexCache,
 )
 from codalab.worker.un_gzip_stream import un_gzip_stream
 from codalab.worker.un_tar_directory import un_tar_directory
@@ -148,6 +151,60 @@ class FileUtilTestAzureBlob(AzureBlobTestBase, unittest.TestCase):
                 ['.', './a', './a/b', './a/b/test2.sh'],
             )
 
+    def test_archive_index_cache(self):
+        _, dirname = self.create_directory()
+        index_path = dirname.replace("/contents.tar.gz", "/index.sqlite")
+        cache = ArchiveIndexCache(max_bytes=1)
+
+        # Repeated reads of the same index share a single local copy.
+        index_file_name = cache.acquire(index_path)
+        self.assertEqual(cache.acquire(index_path), index_file_name)
+        cache.release(index_file_name)
+        cache.release(index_file_name)
+
+        # An evicted index file is only removed once it is no longer in use.
+        index_file_name = cache.acquire(index_path)
+        _, other_dirname = self.create_directory()
+        other_index_path = other_dirname.replace("/contents.tar.gz", "/index.sqlite")
+        other_index_file_name = cache.acquire(other_index_path)
+        self.assertTrue(os.path.exists(index_file_name))
+        cache.release(index_file_name)
+        self.assertFalse(os.path.exists(index_file_name))
+        cache.release(other_index_file_name)
+        self.assertTrue(os.path.exists(other_index_file_name))
+
+        # An index file that was removed from disk is downloaded again, and evicting
+        # it doesn't fail.
+        os.remove(other_index_file_name)
+        other_index_file_name = cache.acquire(other_index_path)
+        self.assertTrue(os.path.exists(other_index_file_name))
+        os.remove(other_index_file_name)
+        cache.release(other_index_file_name)
+        cache.release(cache.acquire(index_path))
+
+        # An index that is uploaded again to the same path is downloaded again.
+        index_file_name = cache.acquire(index_path)
+        cache.release(index_file_name)
+        with FileSystems.open(index_path) as f:
+            contents = f.read()
+        with FileSystems.create(index_path) as f:
+            f.write(contents + b"\0")
+        new_index_file_name = cache.acquire(index_path)
+        self.assertNotEqual(new_index_file_name, index_file_name)
+        self.assertFalse(os.path.exists(index_file_name))
+        with open(new_index_file_name, "rb") as f:
+            self.assertEqual(f.read(), contents + b"\0")
+        cache.release(new_index_file_name)
+
+        # A failed download doesn't leave a partial file behind.
+        with FileSystems.create(index_path) as f:
+            f.write(contents)
+        cached_files = set(os.listdir(cache._directory))
+        with patch("codalab.worker.file_util.shutil.copyfileobj", side_effect=IOError):
+            with self.assertRaises(IOError):
+                cache.acquire(index_path)
+        self.assertLessEqual(set(os.listdir(cache._directory)), cached_files)
+
 
 class ArchiveTestBase:
     """Base for archive tests -- tests both archiving and unarchiving directories.